@@ -9,28 +9,21 @@ def udf(
     stats_type: str = 'mean',
 ):
     import geopandas as gpd
-    import pandas as pd
     from shapely.geometry import box
 
     common = fused.load("https://github.com/fusedio/udfs/tree/b7637ee/public/common/")
     df_tiff = common.chunked_tiff_to_points(
         tiff_path, i=chunk_id, x_chunks=x_chunks, y_chunks=y_chunks)
 
+    agg_fn = "SUM" if stats_type == "sum" else "AVG"
     qr = f"""
-        SELECT h3_latlng_to_cell(lat, lng, {h3_size}) AS hex, ARRAY_AGG(data) as agg_data
+        SELECT h3_latlng_to_cell(lat, lng, {h3_size}) AS hex, {agg_fn}(data) as agg_data
         FROM df_tiff
         group by 1
       --  order by 1
     """  
     con= common.duckdb_connect() 
     df = con.query(qr).df()
-    if stats_type=='sum':
-        fn = lambda x: pd.Series(x).sum()
-    elif stats_type=='mean':
-        fn = lambda x: pd.Series(x).mean()
-    else:
-        fn = lambda x: pd.Series(x).mean()
-    df["agg_data"] = df.agg_data.map(fn)
     print(df)
     return df
 
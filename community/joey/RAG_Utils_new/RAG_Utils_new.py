@@ -4,6 +4,12 @@ DEFAULT_QWEN_EMBEDDING_MODEL = "qwen/qwen3-embedding-8b"
 DEFAULT_OPENAI_EMBEDDING_MODEL = "text-embedding-3-large"
 DEFAULT_LLM_MODEL = "openai/gpt-oss-120b"
 DEFAULT_MODEL_PROVIDER = "groq"
+DEFAULT_EMBEDDING_CACHE_PATH = "/mount/embedding_cache/"
+EMBEDDING_API_URLS = {
+  "qwen": "https://openrouter.ai/api/v1/embeddings",
+  "openai": "https://api.openai.com/v1/embeddings",
+}
+EMBEDDING_API_SECRETS = {"qwen": "openrouter_api_key", "openai": "openai_fused"}
 DEFAULT_ENHANCE_PROMPT = "Enhance descriptions for better search. Add relevant keywords, age ranges, demographic terms. Under 50 words."
 
 variable_list = [
@@ -202,37 +208,31 @@ def add_context(
   return df
 
 
-@fused.cache
 def embed_text(
   text: str,
   embedding_model: str = None,
   provider: str = "qwen",
+  cache_path: str = DEFAULT_EMBEDDING_CACHE_PATH,
   verbose: bool = False,
 ) -> list:
-  """Embed a single text string.
+  """Embed a single text string (through the embedding cache, see embed_texts_cached).
 
   Args:
       text: Text to embed
       embedding_model: Model name (defaults based on provider)
       provider: "qwen" (via openrouter) or "openai"
+      cache_path: Directory of the Parquet embedding cache; None disables it
       verbose: Print progress
 
   Returns:
       List of floats (embedding vector)
   """
-  # Set default model based on provider
-  if embedding_model is None:
-      embedding_model = DEFAULT_QWEN_EMBEDDING_MODEL if provider == "qwen" else DEFAULT_OPENAI_EMBEDDING_MODEL
-
-  if provider == "qwen":
-      return embed_text_qwen(text, embedding_model=embedding_model, verbose=verbose)
-
-  from openai import OpenAI
-  client = OpenAI(api_key=fused.secrets["openai_fused"])
-  response = client.embeddings.create(model=embedding_model, input=text)
+  embedding = embed_texts_cached(
+      [text], embedding_model=embedding_model, provider=provider, cache_path=cache_path
+  )[0]
   if verbose:
       print(f"Embedded text: {text[:50]}...")
-  return response.data[0].embedding
+  return embedding
 
 
 @fused.cache
@@ -273,6 +273,9 @@ def embed_texts_batch(
   embedding_model: str = None,
   provider: str = "qwen",
   batch_size: int = 100,
+  max_workers: int = 8,
+  requests_per_second: float = 5.0,
+  cache_path: str = DEFAULT_EMBEDDING_CACHE_PATH,
   verbose: bool = False,
 ) -> list:
   """Batch embed multiple texts in fewer API calls.
@@ -282,75 +285,508 @@ def embed_texts_batch(
       embedding_model: Model name (defaults based on provider)
       provider: "qwen" (via openrouter) or "openai"
       batch_size: Texts per API call (default 100 for OpenAI, 400 for Qwen)
+      max_workers: Concurrent batch requests
+      requests_per_second: Request rate limit (lowered automatically on 429s)
+      cache_path: Directory of the Parquet embedding cache; None disables it
       verbose: Print progress
 
   Returns:
       List of embedding vectors
   """
+  return embed_texts_cached(
+      list(texts),
+      embedding_model=embedding_model,
+      provider=provider,
+      batch_size=batch_size,
+      max_workers=max_workers,
+      requests_per_second=requests_per_second,
+      cache_path=cache_path,
+      verbose=verbose,
+  )
+
+
+# =============================================================================
+# EMBEDDING PIPELINE
+# =============================================================================
+# Texts are deduplicated by content hash, looked up in a Parquet cache on disk
+# (one directory per provider + model), and only the misses are sent, in
+# concurrent batches paced by a token bucket that slows down on 429s.
+# =============================================================================
+
+def text_hash(text: str) -> str:
+  """Content hash used as the embedding cache key."""
+  import hashlib
+
+  return hashlib.blake2b(str(text).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def new_rate_limiter(requests_per_second: float = 5.0, burst: int = None) -> dict:
+  """Token bucket shared by the concurrent batch requests of one pipeline run.
+
+  The rate is halved on a 429 / 5xx (and requests wait for Retry-After), at most once per
+  backoff window so a burst of rejected in-flight requests counts once, then recovers
+  additively with each success, up to `requests_per_second`.
+  """
+  import threading
   import time
 
-  # Set defaults based on provider
-  if embedding_model is None:
-      embedding_model = DEFAULT_QWEN_EMBEDDING_MODEL if provider == "qwen" else DEFAULT_OPENAI_EMBEDDING_MODEL
+  burst = burst or max(1, int(requests_per_second))
+  return {
+      "lock": threading.Lock(),
+      "rate": float(requests_per_second),
+      "max_rate": float(requests_per_second),
+      "min_rate": float(requests_per_second) / 64,
+      "capacity": float(burst),
+      "tokens": float(burst),
+      "updated": time.monotonic(),
+      "blocked_until": 0.0,
+      "throttled": 0,
+  }
 
-  if provider == "qwen":
-      batch_size = min(batch_size, 400)  # Qwen supports larger batches
 
-  all_embeddings = []
-  total = len(texts)
+def _limiter_acquire(limiter: dict):
+  import time
+
+  while True:
+      with limiter["lock"]:
+          now = time.monotonic()
+          limiter["tokens"] = min(
+              limiter["capacity"],
+              limiter["tokens"] + (now - limiter["updated"]) * limiter["rate"],
+          )
+          limiter["updated"] = now
+          if now < limiter["blocked_until"]:
+              wait = limiter["blocked_until"] - now
+          elif limiter["tokens"] >= 1:
+              limiter["tokens"] -= 1
+              return
+          else:
+              wait = (1 - limiter["tokens"]) / limiter["rate"]
+      time.sleep(wait)
 
-  for i in range(0, total, batch_size):
-      batch = list(texts[i:i + batch_size])
 
-      if verbose:
-          print(f"Embedding batch {i//batch_size + 1}/{(total + batch_size - 1)//batch_size} ({len(batch)} texts)")
+def _limiter_throttle(limiter: dict, retry_after: float):
+  import time
 
-      if provider == "qwen":
-          embeddings = _embed_batch_qwen(batch, embedding_model)
-      else:
-          embeddings = _embed_batch_openai(batch, embedding_model)
+  with limiter["lock"]:
+      now = time.monotonic()
+      if now >= limiter["blocked_until"]:
+          # the other requests in flight when the limit hit get 429 too: only the first one slows down
+          limiter["rate"] = max(limiter["rate"] / 2, limiter["min_rate"])
+      limiter["tokens"] = 0.0
+      limiter["blocked_until"] = max(limiter["blocked_until"], now + retry_after)
+      limiter["throttled"] += 1
 
-      all_embeddings.extend(embeddings)
 
-      # Small delay between batches to avoid rate limiting
-      if i + batch_size < total:
-          time.sleep(0.2)
+def _limiter_success(limiter: dict):
+  with limiter["lock"]:
+      limiter["rate"] = min(limiter["max_rate"], limiter["rate"] + limiter["max_rate"] / 20)
 
-  if verbose:
-      print(f"Embedded {len(all_embeddings)} texts total")
 
-  return all_embeddings
+def _retry_after_seconds(value, default: float) -> float:
+  """Parse a Retry-After header (seconds or HTTP date)."""
+  if not value:
+      return default
+  try:
+      return max(float(value), 0.0)
+  except ValueError:
+      pass
+  try:
+      from datetime import datetime, timezone
+      from email.utils import parsedate_to_datetime
 
+      return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+  except (TypeError, ValueError):
+      return default
 
-def _embed_batch_openai(
+
+def _embed_batch_limited(
   texts: list,
-  embedding_model: str = DEFAULT_OPENAI_EMBEDDING_MODEL,
+  embedding_model: str,
+  api_url: str,
+  api_key: str,
+  limiter: dict,
+  max_retries: int = 8,
+  timeout: float = 120,
 ) -> list:
-  """Internal: Batch embed using OpenAI API."""
-  from openai import OpenAI
+  """Internal: one embeddings request, paced by `limiter` and retried on 429 / 5xx."""
+  import requests
+
+  headers = {"Content-Type": "application/json"}
+  if api_key:
+      headers["Authorization"] = f"Bearer {api_key}"
+  for attempt in range(max_retries + 1):
+      _limiter_acquire(limiter)
+      response = requests.post(
+          api_url,
+          headers=headers,
+          json={"model": embedding_model, "input": list(texts)},
+          timeout=timeout,
+      )
+      if response.status_code == 429 or response.status_code >= 500:
+          if attempt == max_retries:
+              response.raise_for_status()
+          backoff = min(0.5 * 2 ** attempt, 30)
+          _limiter_throttle(limiter, _retry_after_seconds(response.headers.get("Retry-After"), backoff))
+          continue
+      response.raise_for_status()
+      _limiter_success(limiter)
+      data = sorted(response.json()["data"], key=lambda item: item.get("index", 0))
+      return [item["embedding"] for item in data]
 
-  client = OpenAI(api_key=fused.secrets["openai_fused"])
-  response = client.embeddings.create(model=embedding_model, input=texts)
-  return [item.embedding for item in response.data]
 
+def _embedding_cache_dir(cache_path: str, provider: str, embedding_model: str) -> str:
+  import os
 
-def _embed_batch_qwen(
-  texts: list,
+  return os.path.join(cache_path, f"{provider}__{embedding_model.replace('/', '__')}")
+
+
+def resolve_embedding_cache_path(cache_path: str = DEFAULT_EMBEDDING_CACHE_PATH) -> str:
+  """`cache_path` if it can be written here, else a directory under the system temp dir.
+
+  Paths on /mount are only used when /mount exists (it is never created), so running
+  outside Fused falls back to the temp dir.
+  """
+  import os
+  import tempfile
+
+  if not cache_path:
+      return cache_path
+  if not (os.path.abspath(cache_path).startswith("/mount/") and not os.path.isdir("/mount")):
+      try:
+          os.makedirs(cache_path, exist_ok=True)
+          if os.access(cache_path, os.W_OK):
+              return cache_path
+      except OSError:
+          pass
+  return os.path.join(tempfile.gettempdir(), "embedding_cache")
+
+
+def read_embedding_cache(
+  hashes: list,
+  embedding_model: str = DEFAULT_QWEN_EMBEDDING_MODEL,
+  provider: str = "qwen",
+  cache_path: str = DEFAULT_EMBEDDING_CACHE_PATH,
+) -> dict:
+  """Cached embeddings for the given text hashes, as {hash: embedding}."""
+  import os
+  import pyarrow.dataset as ds
+
+  cache_dir = _embedding_cache_dir(cache_path, provider, embedding_model)
+  if not hashes or not os.path.isdir(cache_dir):
+      return {}
+  for attempt in range(3):
+      try:
+          dataset = ds.dataset(cache_dir, format="parquet")
+          table = dataset.to_table(filter=ds.field("hash").isin(list(hashes)))
+          break
+      except FileNotFoundError:
+          # a concurrent compaction removed a part between listing and reading it
+          if attempt == 2:
+              raise
+  return dict(zip(table.column("hash").to_pylist(), table.column("embedding").to_pylist()))
+
+
+def write_embedding_cache(
+  hashes: list,
+  embeddings: list,
+  embedding_model: str = DEFAULT_QWEN_EMBEDDING_MODEL,
+  provider: str = "qwen",
+  cache_path: str = DEFAULT_EMBEDDING_CACHE_PATH,
+) -> str:
+  """Append one Parquet part to the cache (written to a hidden temp file, then renamed)."""
+  import os
+  import uuid
+  import pyarrow as pa
+  import pyarrow.parquet as pq
+
+  cache_dir = _embedding_cache_dir(cache_path, provider, embedding_model)
+  os.makedirs(cache_dir, exist_ok=True)
+  table = pa.table({
+      "hash": pa.array(list(hashes), pa.string()),
+      "embedding": pa.array(list(embeddings), pa.list_(pa.float64())),
+  })
+  name = f"part-{uuid.uuid4().hex}.parquet"
+  tmp_path = os.path.join(cache_dir, f".{name}")
+  pq.write_table(table, tmp_path)
+  path = os.path.join(cache_dir, name)
+  os.replace(tmp_path, path)
+  return path
+
+
+def compact_embedding_cache(
   embedding_model: str = DEFAULT_QWEN_EMBEDDING_MODEL,
+  provider: str = "qwen",
+  cache_path: str = DEFAULT_EMBEDDING_CACHE_PATH,
+  min_parts: int = 32,
+) -> int:
+  """Merge the cache parts into one (deduplicated by hash) once there are at least `min_parts`.
+
+  The merged part is written before the old ones are removed, so a concurrent reader or
+  compaction never loses entries. Returns the number of parts merged (0 if skipped).
+  """
+  import glob
+  import os
+  import pyarrow.parquet as pq
+
+  cache_dir = _embedding_cache_dir(cache_path, provider, embedding_model)
+  parts = sorted(glob.glob(os.path.join(cache_dir, "part-*.parquet")))
+  if len(parts) < min_parts:
+      return 0
+  try:
+      table = pq.ParquetDataset(parts).read()
+  except FileNotFoundError:
+      return 0  # another process is compacting the same parts
+  hashes = table.column("hash").to_pylist()
+  first = list({h: i for i, h in reversed(list(enumerate(hashes)))}.values())
+  table = table.take(sorted(first))
+  write_embedding_cache(
+      table.column("hash").to_pylist(), table.column("embedding").to_pylist(),
+      embedding_model, provider, cache_path,
+  )
+  for path in parts:
+      try:
+          os.remove(path)
+      except FileNotFoundError:
+          pass
+  return len(parts)
+
+
+def embed_texts_cached(
+  texts: list,
+  embedding_model: str = None,
+  provider: str = "qwen",
+  batch_size: int = 100,
+  max_workers: int = 8,
+  requests_per_second: float = 5.0,
+  cache_path: str = DEFAULT_EMBEDDING_CACHE_PATH,
+  api_url: str = None,
+  api_key: str = None,
+  stats: dict = None,
+  verbose: bool = False,
 ) -> list:
-  """Internal: Batch embed using Qwen via OpenRouter."""
+  """Embed texts, sending only the ones not seen before.
+
+  Args:
+      texts: List of texts to embed (duplicates are embedded once)
+      embedding_model: Model name (defaults based on provider)
+      provider: "qwen" (via openrouter) or "openai"
+      batch_size: Texts per API call (capped at 400 for Qwen)
+      max_workers: Concurrent batch requests
+      requests_per_second: Starting (and maximum) request rate of the token bucket
+      cache_path: Directory of the Parquet embedding cache (a temp dir is used when it is
+          not writable, e.g. no /mount outside Fused); None disables it
+      api_url: Embeddings endpoint (defaults based on provider), e.g. a fake_embedding_server url
+      api_key: Bearer token (defaults to the provider's fused secret when api_url is not set)
+      stats: Optional dict filled with texts / unique / cached / requested / batches / throttled
+      verbose: Print progress
+
+  Returns:
+      List of embedding vectors, in the order of `texts`
+  """
+  from concurrent.futures import ThreadPoolExecutor, as_completed
+
+  if embedding_model is None:
+      embedding_model = DEFAULT_QWEN_EMBEDDING_MODEL if provider == "qwen" else DEFAULT_OPENAI_EMBEDDING_MODEL
+  if provider == "qwen":
+      batch_size = min(batch_size, 400)
+  if api_url is None:
+      api_url = EMBEDDING_API_URLS[provider]
+      if api_key is None:
+          api_key = fused.secrets[EMBEDDING_API_SECRETS[provider]]
+
+  hashes = [text_hash(text) for text in texts]
+  unique = dict(zip(hashes, texts))
+  found = {}
+  cache_path = resolve_embedding_cache_path(cache_path)
+  if cache_path:
+      found = read_embedding_cache(list(unique), embedding_model, provider, cache_path)
+  misses = [h for h in unique if h not in found]
+  batches = [misses[i:i + batch_size] for i in range(0, len(misses), batch_size)]
+  limiter = new_rate_limiter(requests_per_second)
+
+  if verbose:
+      print(f"Embedding {len(texts)} texts: {len(unique)} unique, {len(found)} cached, "
+            f"{len(misses)} to send in {len(batches)} batches")
+
+  def embed_batch(batch_hashes):
+      embeddings = _embed_batch_limited(
+          [unique[h] for h in batch_hashes], embedding_model, api_url, api_key, limiter
+      )
+      return batch_hashes, embeddings
+
+  # new embeddings are written in parts of at least `flush_rows`, so an interrupted run
+  # keeps most of what it already paid for without leaving one tiny part per batch
+  flush_rows = max(batch_size * max_workers, 1000)
+  pending_hashes, pending_embeddings = [], []
+
+  def flush():
+      if cache_path and pending_hashes:
+          write_embedding_cache(pending_hashes, pending_embeddings, embedding_model, provider, cache_path)
+      pending_hashes.clear()
+      pending_embeddings.clear()
+
+  if batches:
+      try:
+          with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(batches)))) as pool:
+              for future in as_completed([pool.submit(embed_batch, batch) for batch in batches]):
+                  batch_hashes, embeddings = future.result()
+                  found.update(zip(batch_hashes, embeddings))
+                  pending_hashes.extend(batch_hashes)
+                  pending_embeddings.extend(embeddings)
+                  if len(pending_hashes) >= flush_rows:
+                      flush()
+      finally:
+          flush()
+      if cache_path:
+          compact_embedding_cache(embedding_model, provider, cache_path)
+
+  if stats is not None:
+      stats.update(
+          texts=len(texts),
+          unique=len(unique),
+          cached=len(unique) - len(misses),
+          requested=len(misses),
+          batches=len(batches),
+          throttled=limiter["throttled"],
+      )
+  if verbose:
+      print(f"Embedded {len(misses)} new texts ({limiter['throttled']} throttled requests)")
+  return [found[h] for h in hashes]
+
+
+def fake_embedding_server(
+  dims: int = 64,
+  requests_per_second: float = None,
+  latency: float = 0.05,
+  port: int = 0,
+) -> dict:
+  """Local OpenAI-style /embeddings server for testing the pipeline offline.
+
+  Embeddings are deterministic per text. With `requests_per_second`, requests over
+  that rate get a 429 with a Retry-After header. Runs in a daemon thread; returns
+  {"url", "stats", "stop"}.
+  """
+  import hashlib
+  import json
+  import threading
+  import time
+  from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+  import numpy as np
+
+  stats = {"requests": 0, "rate_limited": 0, "texts": 0}
+  lock = threading.Lock()
+  bucket = {"tokens": float(requests_per_second or 0), "updated": time.monotonic()}
+
+  def admit():
+      if not requests_per_second:
+          return 0.0
+      with lock:
+          now = time.monotonic()
+          bucket["tokens"] = min(
+              requests_per_second, bucket["tokens"] + (now - bucket["updated"]) * requests_per_second
+          )
+          bucket["updated"] = now
+          if bucket["tokens"] >= 1:
+              bucket["tokens"] -= 1
+              return 0.0
+          return (1 - bucket["tokens"]) / requests_per_second
+
+  def embed(text):
+      seed = int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+      vec = np.random.default_rng(seed).standard_normal(dims)
+      return (vec / np.linalg.norm(vec)).tolist()
+
+  class Handler(BaseHTTPRequestHandler):
+      def do_POST(self):
+          body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+          with lock:
+              stats["requests"] += 1
+          wait = admit()
+          if wait:
+              with lock:
+                  stats["rate_limited"] += 1
+              self.send_response(429)
+              self.send_header("Retry-After", f"{wait:.2f}")
+              self.end_headers()
+              return
+          time.sleep(latency)
+          inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+          with lock:
+              stats["texts"] += len(inputs)
+          payload = json.dumps({
+              "object": "list",
+              "model": body.get("model"),
+              "data": [{"object": "embedding", "index": i, "embedding": embed(t)} for i, t in enumerate(inputs)],
+          }).encode()
+          self.send_response(200)
+          self.send_header("Content-Type", "application/json")
+          self.send_header("Content-Length", str(len(payload)))
+          self.end_headers()
+          self.wfile.write(payload)
+
+      def log_message(self, *args):
+          pass
+
+  server = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+  server.daemon_threads = True
+  threading.Thread(target=server.serve_forever, daemon=True).start()
+
+  def stop():
+      server.shutdown()
+      server.server_close()
+
+  return {"url": f"http://127.0.0.1:{server.server_address[1]}/v1/embeddings", "stats": stats, "stop": stop}
+
+
+def benchmark_embedding_pipeline(
+  n_texts: int = 2000,
+  duplicate_fraction: float = 0.3,
+  batch_size: int = 50,
+  max_workers: int = 8,
+  server_requests_per_second: float = 20,
+  latency: float = 0.2,
+):
+  """Sequential batches (previous embed_texts_batch) vs the cached concurrent pipeline, on a fake server."""
+  import tempfile
+  import time
+  import pandas as pd
   import requests
 
-  response = requests.post(
-      "https://openrouter.ai/api/v1/embeddings",
-      headers={
-          "Authorization": f"Bearer {fused.secrets['openrouter_api_key']}",
-          "Content-Type": "application/json",
-      },
-      json={"model": embedding_model, "input": texts}
-  )
-  response.raise_for_status()
-  return [item["embedding"] for item in response.json()["data"]]
+  n_unique = max(1, int(n_texts * (1 - duplicate_fraction)))
+  texts = [f"text {i % n_unique}" for i in range(n_texts)]
+  server = fake_embedding_server(requests_per_second=server_requests_per_second, latency=latency)
+  results = {}
+  try:
+      start = time.perf_counter()
+      sequential = []
+      for i in range(0, n_texts, batch_size):
+          response = requests.post(server["url"], json={"model": "fake", "input": texts[i:i + batch_size]})
+          response.raise_for_status()
+          sequential.extend(item["embedding"] for item in response.json()["data"])
+          time.sleep(0.2)
+      results["sequential"] = {"seconds": time.perf_counter() - start, "requests": server["stats"]["requests"]}
+
+      with tempfile.TemporaryDirectory() as cache_path:
+          for run in ["pipeline_cold", "pipeline_warm"]:
+              before = server["stats"]["requests"]
+              stats = {}
+              start = time.perf_counter()
+              embeddings = embed_texts_cached(
+                  texts, embedding_model="fake", batch_size=batch_size, max_workers=max_workers,
+                  requests_per_second=server_requests_per_second, cache_path=cache_path,
+                  api_url=server["url"], stats=stats,
+              )
+              results[run] = {
+                  "seconds": time.perf_counter() - start,
+                  "requests": server["stats"]["requests"] - before,
+                  "throttled": stats["throttled"],
+              }
+              assert embeddings == sequential
+  finally:
+      server["stop"]()
+  print(pd.DataFrame(results).T)
+  return results
 
 
 @fused.cache
@@ -362,10 +798,15 @@ def add_embedding(
   provider: str = "qwen",
   batch_size: int = 100,
   max_workers: int = 16,
+  requests_per_second: float = 5.0,
+  cache_path: str = DEFAULT_EMBEDDING_CACHE_PATH,
   verbose: bool = False,
 ):
   """Add embeddings to dataframe using parallel batch processing.
 
+  Duplicate texts and texts already in the embedding cache are not sent again
+  (see embed_texts_cached).
+
   Args:
       df: DataFrame with text column
       variable_col: Column containing text to embed
@@ -374,52 +815,24 @@ def add_embedding(
       provider: "qwen" (via openrouter, default) or "openai"
       batch_size: Texts per API call (default 100)
       max_workers: Parallel batch workers (default 16)
+      requests_per_second: Request rate limit (lowered automatically on 429s)
+      cache_path: Directory of the Parquet embedding cache; None disables it
       verbose: Print progress
 
   Returns:
       DataFrame with embedding column added
   """
-  common = fused.load(
-      "https://github.com/fusedio/udfs/tree/2a1b488/public/common/"
-  )
-
-  # Set default model based on provider
-  if embedding_model is None:
-      embedding_model = DEFAULT_QWEN_EMBEDDING_MODEL if provider == "qwen" else DEFAULT_OPENAI_EMBEDDING_MODEL
-
-  # Qwen supports larger batches
-  if provider == "qwen":
-      batch_size = min(batch_size, 400)
-
-  texts = list(df[variable_col])
-  total = len(texts)
-
-  # Split into batches
-  batches = [texts[i:i + batch_size] for i in range(0, total, batch_size)]
-  num_batches = len(batches)
-
-  if verbose:
-      print(f"Embedding {total} texts in {num_batches} batches (batch_size={batch_size}, provider={provider})")
-
-  # Define batch embedding function
-  def embed_batch(batch_texts):
-      if provider == "qwen":
-          return _embed_batch_qwen(batch_texts, embedding_model)
-      else:
-          return _embed_batch_openai(batch_texts, embedding_model)
-
-  # Run batches in parallel using run_pool
-  batch_results = common.run_pool(
-      embed_batch,
-      batches,
+  embeddings = embed_texts_cached(
+      list(df[variable_col]),
+      embedding_model=embedding_model,
+      provider=provider,
+      batch_size=batch_size,
       max_workers=max_workers,
+      requests_per_second=requests_per_second,
+      cache_path=cache_path,
+      verbose=verbose,
   )
 
-  # Flatten results back to single list
-  embeddings = []
-  for batch_embeddings in batch_results:
-      embeddings.extend(batch_embeddings)
-
   df[embedding_col] = embeddings
   if verbose:
       print(f"Added {len(embeddings)} embeddings ({len(embeddings[0])} dims)")
@@ -81,6 +81,8 @@ def read_overview(path, bounds, res, value):
     dataset = ds.dataset(path.strip("/") + f"/overview/hex{res}.parquet", format="parquet")
     col_names = dataset.schema.names
 
+    value_filter = _value_filter(dataset.schema, value)
+
     filtered = False
     if "lat" in col_names and "lng" in col_names:
         # "new" type of overview files -> we can directly filter on the lat/lng columns
@@ -88,6 +90,8 @@ def read_overview(path, bounds, res, value):
             (ds.field("lat") > bounds[1]) & (ds.field("lat") < bounds[3])
             & (ds.field("lng") > bounds[0]) & (ds.field("lng") < bounds[2])
         ) 
+        if value_filter is not None:
+            filter = filter & value_filter
         col_names.remove("lat")
         col_names.remove("lng")
         df = dataset.to_table(filter=filter, columns=col_names).to_pandas()
@@ -113,13 +117,10 @@ def read_overview(path, bounds, res, value):
         fragment = fragment.subset(row_group_ids=list(df_meta["chunk_id"]))
         dataset_filtered = ds.FileSystemDataset([fragment], dataset.schema, dataset.format, dataset.filesystem)
 
-        df = dataset_filtered.to_table().to_pandas()
+        df = dataset_filtered.to_table(filter=value_filter).to_pandas()
 
     else:
-        df = dataset.to_table().to_pandas()
-
-    if value is not None:
-        df = df[df["data"] == value]
+        df = dataset.to_table(filter=value_filter).to_pandas()
 
     if not filtered:
         df = common.filter_hex_bounds(df, bounds, col_hex="hex")
@@ -134,28 +135,29 @@ def read_overview(path, bounds, res, value):
 
 
 def read_dataset(path, bounds, res, value, base_res=7, columns=None):
-    import pandas as pd
+    import mercantile
+    import pyarrow.dataset as ds
     import shapely
 
     import h3.api.basic_int as h3
 
-    # Get data and filter based on value and hex_bounds
     dataset = common.get_dataset_from_table(path, bounds)
-    if columns is None:
-        # by default, don't materialize those columns
-        columns = dataset.schema.names
-        for col in ["source_url", "res"]:
-            if col in columns:
-                columns.remove(col)
-    df = dataset.to_table(columns=columns).to_pandas()
+    columns = _scan_columns(dataset.schema, columns)
+    first = dataset.head(1, columns=["hex"])["hex"]
+    if len(first) == 0:
+        return dataset.schema.empty_table().select(columns).to_pandas()
 
-    data_res = h3.get_resolution(df["hex"].iloc[0])
+    data_res = h3.get_resolution(first[0].as_py())
     if res > data_res:
         res = data_res
         print(f"truncating to data resolution {res}")
 
-    if "pos7" in df.columns:
+    # `data == value` is evaluated inside the Arrow scan, so non-matching rows are never materialized
+    value_filter = _value_filter(dataset.schema, value)
+
+    if "pos7" in columns:
         # old style files with pos7, pos8, etc columns
+        df = dataset.to_table(columns=columns, filter=value_filter).to_pandas()
         
         # List Cell ids of the requested resolution filling the bbox
         # hex_bounds = common.bounds_to_hex(bounds, 7)
@@ -177,66 +179,153 @@ def read_dataset(path, bounds, res, value, base_res=7, columns=None):
             FROM ({qr}) 
             GROUP BY 1,2
         """
-        df = con.sql(qr).df()
+        return con.sql(qr).df()
 
-    # files with "hex" column
-    elif res == data_res:
-        # reading at originnal data resolution -> no aggregation needed
-        con = common.duckdb_connect()
-        if "cnt" in df.columns:
-            qr = f"""
-                SELECT
-                    *,
-                    (100*cnt/cnt_total)::FLOAT AS pct
-                FROM df
-                WHERE h3_cell_to_lat(hex) BETWEEN {bounds[1]} AND {bounds[3]}
-                  AND h3_cell_to_lng(hex) BETWEEN {bounds[0]} AND {bounds[2]}
-            """
-        else:
-            qr = f"""
-                SELECT * FROM df
-                WHERE h3_cell_to_lat(hex) BETWEEN {bounds[1]} AND {bounds[3]}
-                  AND h3_cell_to_lng(hex) BETWEEN {bounds[0]} AND {bounds[2]}
-            """
-        df = con.sql(qr).df()
-        
-    else:
+    if res == data_res:
+        # reading at original data resolution -> no aggregation needed, stream the filtered scan
         con = common.duckdb_connect()
+        reader = dataset.scanner(columns=columns, filter=value_filter).to_reader()
+        pct = ", (100*cnt/cnt_total)::FLOAT AS pct" if "cnt" in columns else ""
         qr = f"""
-            SELECT * EXCLUDE(hex), h3_cell_to_parent(hex, {res}) AS hex FROM df
-            WHERE h3_cell_to_lat(h3_cell_to_parent(hex, {res})) BETWEEN {bounds[1]} AND {bounds[3]}
-              AND h3_cell_to_lng(h3_cell_to_parent(hex, {res})) BETWEEN {bounds[0]} AND {bounds[2]}
+            SELECT *{pct} FROM reader
+            WHERE h3_cell_to_lat(hex) BETWEEN {bounds[1]} AND {bounds[3]}
+              AND h3_cell_to_lng(hex) BETWEEN {bounds[0]} AND {bounds[2]}
         """
-        if "cnt" in df.columns:
-            qr = f"""
-                SELECT
-                    hex,
-                    data,
-                    SUM(cnt)::INT AS cnt,
-                    SUM(SUM(cnt)) OVER (PARTITION BY hex)::INT AS cnt_total,
-                    (100*SUM(cnt/cnt_total)/7^{data_res-res})::FLOAT AS pct
-                FROM ({qr}) 
-                GROUP BY 1,2
-            """
-        else:
-            metrics = {"_sum": "SUM", "_avg": "AVG", "_min": "MIN", "_max": "MAX"}
-            data_cols = [col for col in df.columns if col[-4:] in metrics.keys()]
-
-            data_cols_aggr = []
-            for col in data_cols:
-                data_cols_aggr.append(f"{metrics[col[-4:]]}({col}) as {col}")
-
-            data_cols_aggr_str = ", ".join(data_cols_aggr)
-            qr = f"""
-                SELECT
-                    hex,
-                    {data_cols_aggr_str}
-                FROM ({qr}) 
-                GROUP BY 1
-            """
-        df = con.sql(qr).df()
-
-    if value is not None:
-        df = df[df["data"] == value].reset_index(drop=True)
+        return con.sql(qr).df()
+
+    # Coarser resolution: aggregate per map tile, cached per (dataset version, res, tile), so
+    # panning at the same zoom only scans tiles that were not requested before.
+    import pandas as pd
+
+    version = dataset_version(path, cache_verbose=False)
+    zoom = common.estimate_zoom(bounds)
+    tiles = list(mercantile.tiles(*bounds, zooms=zoom))
+    df = pd.concat(
+        [
+            read_tile_aggregate(path, version, res, data_res, tile.x, tile.y, tile.z, value, columns, cache_verbose=False)
+            for tile in tiles
+        ],
+        ignore_index=True,
+    )
+    in_bounds = df["lat"].between(bounds[1], bounds[3]) & df["lng"].between(bounds[0], bounds[2])
+    return df[in_bounds].drop(columns=["lat", "lng"]).reset_index(drop=True)
+
+
+def _scan_columns(schema, columns=None):
+    if columns is None:
+        # by default, don't materialize those columns
+        columns = [col for col in schema.names if col not in ("source_url", "res")]
+    columns = list(columns)
+    if "hex" in schema.names and "hex" not in columns:
+        columns.append("hex")
+    return columns
+
+
+def _value_filter(schema, value):
+    import pyarrow.dataset as ds
+    if value is None or "data" not in schema.names:
+        return None
+    return ds.field("data") == value
+
+
+@fused.cache(cache_max_age="5m")
+def dataset_version(path):
+    """Identity of the current dataset contents (ETag / mtime of its _sample file), used as a cache key."""
+    import fsspec
+    fs, root = fsspec.core.url_to_fs(path.rstrip("/") + "/_sample")
+    info = fs.info(root)
+    return str(info.get("ETag") or info.get("LastModified") or info.get("mtime") or info.get("size"))
+
+
+def _padded_tile_bounds(x, y, z, res):
+    """Tile bounds padded by two parent-cell edges, so every child of a parent centered in the tile is read."""
+    import math
+    import mercantile
 
+    import h3.api.basic_int as h3
+
+    west, south, east, north = mercantile.bounds(x, y, z)
+    pad = 2 * h3.average_hexagon_edge_length(res, unit="km") / 111.32
+    coslat = max(math.cos(math.radians(max(abs(south), abs(north)))), 0.01)
+    return [max(-180, west - pad / coslat), max(-90, south - pad), min(180, east + pad / coslat), min(90, north + pad)]
+
+
+@fused.cache
+def read_tile_aggregate(path, version, res, data_res, x, y, z, value=None, columns=None):
+    """
+    Streaming group-by to parent `res` of the cells whose parent center falls in tile x/y/z.
+
+    `version` is only part of the cache key (see dataset_version). Record batches flow from the
+    Arrow scan (with the value predicate pushed down) straight into DuckDB's hash aggregate,
+    so the selected chunks are never materialized as one table.
+    """
+    import mercantile
+
+    west, south, east, north = mercantile.bounds(x, y, z)
+    dataset = common.get_dataset_from_table(path, _padded_tile_bounds(x, y, z, res))
+    columns = _scan_columns(dataset.schema, columns)
+    value_filter = _value_filter(dataset.schema, value)
+    reader = dataset.scanner(columns=columns, filter=value_filter).to_reader()
+
+    parents = f"""
+        SELECT * EXCLUDE(hex), h3_cell_to_parent(hex, {res}) AS hex FROM reader
+    """
+    # half-open tile extent so a parent is assigned to exactly one tile
+    in_tile = f"""
+        lat >= {south} AND lat < {north} AND lng >= {west} AND lng < {east}
+    """
+    con = common.duckdb_connect()
+    # the reader can only be consumed once, so the streaming scan is a plain group-by; the window
+    # and tile filter run on the (small) aggregate, where DuckDB may scan its input more than once
+    if "cnt" in columns:
+        agg = con.sql(f"""
+            SELECT hex, data, SUM(cnt) AS cnt, SUM(cnt/cnt_total) AS frac
+            FROM ({parents})
+            GROUP BY 1,2
+        """).df()
+        qr = f"""
+            SELECT
+                hex,
+                data,
+                cnt::INT AS cnt,
+                SUM(cnt) OVER (PARTITION BY hex)::INT AS cnt_total,
+                (100*frac/7^{data_res-res})::FLOAT AS pct
+            FROM agg
+        """
+    else:
+        metrics = {"_sum": "SUM", "_avg": "AVG", "_min": "MIN", "_max": "MAX"}
+        data_cols_aggr = [f"{metrics[col[-4:]]}({col}) as {col}" for col in columns if col[-4:] in metrics]
+        group_cols = ["hex"] + (["data"] if value_filter is not None else [])
+        agg = con.sql(f"""
+            SELECT
+                {", ".join(group_cols + data_cols_aggr)}
+            FROM ({parents})
+            GROUP BY {", ".join(str(i + 1) for i in range(len(group_cols)))}
+        """).df()
+        qr = "SELECT * FROM agg"
+    df = con.sql(f"""
+        SELECT * FROM (
+            SELECT *, h3_cell_to_lat(hex) AS lat, h3_cell_to_lng(hex) AS lng FROM ({qr})
+        ) WHERE {in_tile}
+    """).df()
+
+    if "cnt" in columns and value_filter is not None:
+        # with the value pushed down, the window above only sees that value's counts;
+        # the per-parent total over all values comes from a (hex, cnt) scan cached per tile
+        totals = read_tile_totals(path, version, res, x, y, z, cache_verbose=False)
+        df = df.drop(columns=["cnt_total"]).merge(totals, on="hex", how="left")
+        df = df[["hex", "data", "cnt", "cnt_total", "pct", "lat", "lng"]]
     return df
+
+
+@fused.cache
+def read_tile_totals(path, version, res, x, y, z):
+    """Total count over all values per parent `res` cell centered in tile x/y/z (value independent)."""
+    dataset = common.get_dataset_from_table(path, _padded_tile_bounds(x, y, z, res))
+    reader = dataset.scanner(columns=["hex", "cnt"]).to_reader()
+    con = common.duckdb_connect()
+    return con.sql(f"""
+        SELECT h3_cell_to_parent(hex, {res}) AS hex, SUM(cnt)::INT AS cnt_total
+        FROM reader
+        GROUP BY 1
+    """).df()
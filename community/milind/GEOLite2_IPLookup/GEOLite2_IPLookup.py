@@ -1,138 +1,245 @@
+# Paths for the MaxMind Parquets
+BLOCKS_V4 = "s3://fused-asset/ipinfo_maxmind/GeoLite2-City-Blocks-IPv4.parquet"
+BLOCKS_V6 = "s3://fused-asset/ipinfo_maxmind/GeoLite2-City-Blocks-IPv6.parquet"
+LOCATIONS = "s3://fused-asset/ipinfo_maxmind/GeoLite2-City-Locations-en.parquet"
+# Prebuilt interval index (see build_ip_index), on the shared mount so it is built once
+DEFAULT_INDEX_PATH = "/mount/geolite2/GeoLite2-City-ip-index.parquet"
+
+RESULT_COLUMNS = [
+    "country_iso_code", "country_name", "subdivision_1_name", "city_name",
+    "latitude", "longitude", "accuracy_radius", "matched_cidr", "prefix_len",
+]
+
+# Loaded indexes per path: {"path": {"keys": ..., "end_hi": ..., "end_lo": ..., "table": ...}}
+_ip_index = {}
+
+
 @fused.udf
-def udf(ip: str = "115.117.126.142"):
-    import duckdb, pandas as pd
-    
-    # Load your common helper
-    common = fused.load("https://github.com/fusedio/udfs/tree/3991434/public/common/")
-    con = common.duckdb_connect(verbose=True)
-    from shapely.geometry import Point
+def udf(ip: str = "115.117.126.142", ips: list = None, index_path: str = DEFAULT_INDEX_PATH):
     import geopandas as gpd
-    # Install/load extensions
-    con.sql("INSTALL httpfs FROM core; LOAD httpfs;")
-    
-    print("DuckDB version:", duckdb.__version__)
-    
-    # Paths for your MaxMind Parquets
-    blocks_v4 = "s3://fused-asset/ipinfo_maxmind/GeoLite2-City-Blocks-IPv4.parquet"
-    blocks_v6 = "s3://fused-asset/ipinfo_maxmind/GeoLite2-City-Blocks-IPv6.parquet"
-    locs      = "s3://fused-asset/ipinfo_maxmind/GeoLite2-City-Locations-en.parquet"
-    
-    # Create views
-    con.sql(f"""
-        CREATE OR REPLACE VIEW blocks4 AS
-        SELECT network, geoname_id, latitude, longitude, accuracy_radius
-        FROM read_parquet('{blocks_v4}');
-    """)
-    con.sql(f"""
-        CREATE OR REPLACE VIEW blocks6 AS
-        SELECT network, geoname_id, latitude, longitude, accuracy_radius
-        FROM read_parquet('{blocks_v6}');
-    """)
-    con.sql(f"""
-        CREATE OR REPLACE VIEW loc AS
-        SELECT *
-        FROM read_parquet('{locs}');
-    """)
-    
-    # Pick family automatically
-    is_ipv6 = ":" in ip
-    
-    if is_ipv6:
-        # For IPv6, use Python's ipaddress module
-        import ipaddress
-        ip_obj = ipaddress.ip_address(ip)
-        
-        # Get all IPv6 blocks and filter in Python
-        blocks_df = con.execute(f"""
-            SELECT 
-                b.network,
-                b.geoname_id,
-                b.latitude,
-                b.longitude,
-                b.accuracy_radius,
-                l.country_iso_code,
-                l.country_name,
-                l.subdivision_1_name,
-                l.city_name
-            FROM blocks6 b
-            JOIN loc l USING(geoname_id)
-        """).df()
-        
-        # Find matching network with longest prefix
-        best_match = None
-        max_prefix = -1
-        
-        for idx, row in blocks_df.iterrows():
-            try:
-                network = ipaddress.ip_network(row['network'])
-                if ip_obj in network and network.prefixlen > max_prefix:
-                    best_match = row
-                    max_prefix = network.prefixlen
-            except:
-                continue
-        
-        if best_match is not None:
-            df = pd.DataFrame([{
-                'country_iso_code': best_match['country_iso_code'],
-                'country_name': best_match['country_name'],
-                'subdivision_1_name': best_match['subdivision_1_name'],
-                'city_name': best_match['city_name'],
-                'latitude': best_match['latitude'],
-                'longitude': best_match['longitude'],
-                'accuracy_radius': best_match['accuracy_radius'],
-                'matched_cidr': best_match['network'],
-                'prefix_len': max_prefix
-            }])
-        else:
-            df = pd.DataFrame()
-    else:
-        # IPv4 logic (existing code)
-        query = f"""
-            WITH ip_parsed AS (
-                SELECT 
-                    CAST(split_part(?, '.', 1) AS BIGINT) * 16777216 +
-                    CAST(split_part(?, '.', 2) AS BIGINT) * 65536 +
-                    CAST(split_part(?, '.', 3) AS BIGINT) * 256 +
-                    CAST(split_part(?, '.', 4) AS BIGINT) AS ip_int
-            ),
-            blocks_parsed AS (
-                SELECT 
-                    b.*,
-                    l.country_iso_code, l.country_name,
-                    l.subdivision_1_name, l.city_name,
-                    CAST(split_part(split_part(b.network, '/', 1), '.', 1) AS BIGINT) * 16777216 +
-                    CAST(split_part(split_part(b.network, '/', 1), '.', 2) AS BIGINT) * 65536 +
-                    CAST(split_part(split_part(b.network, '/', 1), '.', 3) AS BIGINT) * 256 +
-                    CAST(split_part(split_part(b.network, '/', 1), '.', 4) AS BIGINT) AS net_start,
-                    CAST(split_part(b.network, '/', 2) AS INTEGER) AS prefix_len
-                FROM blocks4 b
-                JOIN loc l USING(geoname_id)
-            )
-            SELECT
-                bp.country_iso_code, bp.country_name,
-                bp.subdivision_1_name, bp.city_name,
-                bp.latitude, bp.longitude, bp.accuracy_radius,
-                bp.network AS matched_cidr,
-                bp.prefix_len
-            FROM blocks_parsed bp, ip_parsed ip
-            WHERE (ip.ip_int >> (32 - bp.prefix_len)) = (bp.net_start >> (32 - bp.prefix_len))
-            ORDER BY bp.prefix_len DESC
-            LIMIT 1;
-        """
-        
-        df = con.execute(query, [ip, ip, ip, ip]).df()
-    
-    if not df.empty and 'latitude' in df.columns and 'longitude' in df.columns:
-        geometry = [Point(lon, lat) for lon, lat in zip(df['longitude'], df['latitude'])]
-        gdf = gpd.GeoDataFrame(df, geometry=geometry, crs="EPSG:4326")
+
+    # `ips` resolves many addresses (IPv4 and IPv6 mixed) in one vectorized lookup
+    df = lookup_ips(ips if ips is not None else [ip], index_path=index_path)
+    df = df[df["matched_cidr"].notna()].reset_index(drop=True)
+
+    if not df.empty:
+        gdf = gpd.GeoDataFrame(df, geometry=gpd.points_from_xy(df["longitude"], df["latitude"]), crs="EPSG:4326")
         print(gdf.T)
         return gdf
     else:
         # Return empty GeoDataFrame if no match found
-        gdf = gpd.GeoDataFrame(columns=['ip', 'country_iso_code', 'country_name', 
-                                         'subdivision_1_name', 'city_name', 
+        gdf = gpd.GeoDataFrame(columns=['ip', 'country_iso_code', 'country_name',
+                                         'subdivision_1_name', 'city_name',
                                          'latitude', 'longitude', 'accuracy_radius',
                                          'matched_cidr', 'prefix_len', 'geometry'],
                                crs="EPSG:4326")
-        print("No match found for IP:", ip)
-        return gdf
\ No newline at end of file
+        print("No match found for IP:", ip if ips is None else ips)
+        return gdf
+
+
+def ips_to_u128(ips):
+    """
+    Parse IP strings into 128-bit integers split as (hi, lo) uint64 arrays, plus a validity mask.
+
+    IPv4 addresses are mapped into IPv6 space (::ffff:a.b.c.d) so both families share one
+    index. IPv4 is parsed with Arrow compute kernels; IPv6 uses socket.inet_pton per address.
+    """
+    import socket
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    try:
+        arr = pa.array(ips, type=pa.string())
+    except (pa.ArrowInvalid, pa.ArrowTypeError):
+        arr = pa.array([str(ip) for ip in ips], type=pa.string())
+    arr = pc.fill_null(pc.utf8_trim_whitespace(arr), "")
+    n = len(arr)
+    hi = np.zeros(n, dtype=np.uint64)
+    lo = np.zeros(n, dtype=np.uint64)
+    valid = np.zeros(n, dtype=bool)
+
+    is_v6 = pc.match_substring(arr, ":").to_numpy(zero_copy_only=False)
+    v4_rows = np.flatnonzero(~is_v6)
+    if len(v4_rows):
+        parts = pc.split_pattern(arr.take(pa.array(v4_rows)), ".")
+        four = pc.equal(pc.list_value_length(parts), 4).to_numpy(zero_copy_only=False)
+        v4_rows, parts = v4_rows[four], parts.filter(pa.array(four))
+        octets = pc.list_flatten(parts)
+        digits = pc.and_(pc.utf8_is_digit(octets), pc.less_equal(pc.utf8_length(octets), 3))
+        octets = pc.cast(pc.if_else(digits, octets, "256"), pa.uint16()).to_numpy().reshape(-1, 4)
+        ok = (octets <= 255).all(axis=1)
+        values = octets[ok].astype(np.uint64)
+        rows = v4_rows[ok]
+        lo[rows] = (
+            np.uint64(0xFFFF00000000)
+            | values[:, 0] << np.uint64(24)
+            | values[:, 1] << np.uint64(16)
+            | values[:, 2] << np.uint64(8)
+            | values[:, 3]
+        )
+        valid[rows] = True
+
+    v6_rows = np.flatnonzero(is_v6)
+    if len(v6_rows):
+        def pton(value):
+            try:
+                return socket.inet_pton(socket.AF_INET6, value.partition("%")[0])
+            except OSError:
+                return None
+
+        packed = [pton(value) for value in arr.take(pa.array(v6_rows)).to_pylist()]
+        ok = np.array([value is not None for value in packed], dtype=bool)
+        words = np.zeros((len(v6_rows), 2), dtype=np.uint64)
+        words[ok] = np.frombuffer(b"".join(value for value in packed if value is not None), dtype=">u8").reshape(-1, 2)
+        hi[v6_rows[ok]] = words[ok, 0]
+        lo[v6_rows[ok]] = words[ok, 1]
+        valid[v6_rows[ok]] = True
+    return hi, lo, valid
+
+
+def _sort_keys(hi, lo):
+    """Big-endian 16-byte keys: their byte order (what np.searchsorted compares) is the 128-bit order."""
+    import numpy as np
+
+    keys = np.empty(len(hi), dtype=[("hi", ">u8"), ("lo", ">u8")])
+    keys["hi"] = hi
+    keys["lo"] = lo
+    return keys.view("S16")
+
+
+def _network_ranges(networks):
+    """First / last address of each CIDR as (start_hi, start_lo, end_hi, end_lo, prefix_len) arrays."""
+    import numpy as np
+    import pandas as pd
+
+    networks = pd.Series(networks, dtype=object).astype(str)
+    parts = networks.str.split("/", n=1, expand=True)
+    prefix = parts[1].astype(np.int64).values
+    start_hi, start_lo, _ = ips_to_u128(parts[0].values)
+    # IPv4 prefixes count from bit 96 of the mapped address
+    is_v4 = ~parts[0].str.contains(":", regex=False).values
+    prefix128 = np.where(is_v4, prefix + 96, prefix)
+
+    # host bits set to 1: split the 128-bit mask over the two words
+    host_hi = np.clip(64 - prefix128, 0, 64)
+    host_lo = np.clip(128 - prefix128, 0, 64)
+    ones = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+    def low_bits(bits):
+        out = np.zeros(len(bits), dtype=np.uint64)
+        partial = bits < 64
+        out[partial] = (np.uint64(1) << bits[partial].astype(np.uint64)) - np.uint64(1)
+        out[~partial] = ones
+        return out
+
+    end_hi = start_hi | low_bits(host_hi)
+    end_lo = start_lo | low_bits(host_lo)
+    return start_hi, start_lo, end_hi, end_lo, prefix
+
+
+def build_ip_index(
+    index_path: str = DEFAULT_INDEX_PATH,
+    blocks_v4: str = BLOCKS_V4,
+    blocks_v6: str = BLOCKS_V6,
+    locations: str = LOCATIONS,
+):
+    """
+    Build the sorted interval index of all IPv4 and IPv6 networks and write it as Parquet.
+
+    One row per network with its range as start/end 128-bit integers (start_hi, start_lo,
+    end_hi, end_lo uint64), sorted by start, joined to the location columns.
+    GeoLite2 networks do not overlap, so the last start <= ip is the only candidate.
+    """
+    import os
+    import uuid
+    import numpy as np
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    common = fused.load("https://github.com/fusedio/udfs/tree/3991434/public/common/")
+    con = common.duckdb_connect()
+    con.sql("INSTALL httpfs FROM core; LOAD httpfs;")
+    df = con.sql(f"""
+        SELECT
+            b.network AS matched_cidr,
+            l.country_iso_code, l.country_name,
+            l.subdivision_1_name, l.city_name,
+            b.latitude, b.longitude, b.accuracy_radius
+        FROM (
+            SELECT network, geoname_id, latitude, longitude, accuracy_radius FROM read_parquet('{blocks_v4}')
+            UNION ALL
+            SELECT network, geoname_id, latitude, longitude, accuracy_radius FROM read_parquet('{blocks_v6}')
+        ) b
+        LEFT JOIN read_parquet('{locations}') l USING(geoname_id)
+    """).df()
+
+    start_hi, start_lo, end_hi, end_lo, prefix = _network_ranges(df["matched_cidr"].values)
+    df["start_hi"], df["start_lo"], df["end_hi"], df["end_lo"] = start_hi, start_lo, end_hi, end_lo
+    df["prefix_len"] = prefix.astype(np.int16)
+    # an IPv4 network listed again in the IPv6 table as ::ffff:0:0/96 maps onto the same range
+    df = df.drop_duplicates(["start_hi", "start_lo", "end_hi", "end_lo"])
+    df = df.sort_values(["start_hi", "start_lo"], kind="stable").reset_index(drop=True)
+
+    keys = _sort_keys(df["start_hi"].values, df["start_lo"].values)
+    ends = _sort_keys(df["end_hi"].values, df["end_lo"].values)
+    overlaps = int((keys[1:] <= ends[:-1]).sum())
+    if overlaps:
+        print(f"Warning: {overlaps} networks overlap their predecessor; lookups match the one starting last")
+
+    os.makedirs(os.path.dirname(index_path), exist_ok=True)
+    columns = ["start_hi", "start_lo", "end_hi", "end_lo"] + RESULT_COLUMNS
+    # write next to the target and swap it in, so concurrent readers never see a partial file
+    tmp_path = f"{index_path}.{os.getpid()}.{uuid.uuid4().hex}.tmp"
+    try:
+        pq.write_table(pa.Table.from_pandas(df[columns], preserve_index=False), tmp_path)
+        os.replace(tmp_path, index_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    _ip_index.pop(index_path, None)
+    print(f"Wrote {len(df)} networks to {index_path}")
+    return index_path
+
+
+def load_ip_index(index_path: str = DEFAULT_INDEX_PATH, rebuild: bool = False):
+    """Memory-map the interval index (building it first if missing), cached per process."""
+    import os
+    import pyarrow.parquet as pq
+
+    if rebuild or not os.path.exists(index_path):
+        build_ip_index(index_path)
+    if index_path not in _ip_index:
+        table = pq.read_table(index_path, memory_map=True)
+        _ip_index[index_path] = {
+            "keys": _sort_keys(table.column("start_hi").to_numpy(), table.column("start_lo").to_numpy()),
+            "end_hi": table.column("end_hi").to_numpy(),
+            "end_lo": table.column("end_lo").to_numpy(),
+            "table": table.select(RESULT_COLUMNS),
+        }
+    return _ip_index[index_path]
+
+
+def lookup_ips(ips, index_path: str = DEFAULT_INDEX_PATH, index: dict = None):
+    """
+    Resolve IPv4 / IPv6 addresses to their GeoLite2 network and location.
+
+    Binary search (np.searchsorted) of every address in the sorted start addresses, then a
+    vectorized check that it is not past the end of that network. Returns one row per input
+    (same order) with `ip` plus RESULT_COLUMNS, missing values where nothing matches.
+    """
+    import numpy as np
+    import pyarrow as pa
+
+    index = index or load_ip_index(index_path)
+    hi, lo, valid = ips_to_u128(ips)
+    pos = np.searchsorted(index["keys"], _sort_keys(hi, lo), side="right") - 1
+    candidate = np.maximum(pos, 0)
+    end_hi, end_lo = index["end_hi"][candidate], index["end_lo"][candidate]
+    inside = (hi < end_hi) | ((hi == end_hi) & (lo <= end_lo))
+    matched = valid & (pos >= 0) & inside
+
+    rows = pa.array(np.where(matched, candidate, 0), mask=~matched)
+    df = index["table"].take(rows).to_pandas()
+    df.insert(0, "ip", list(ips))
+    return df
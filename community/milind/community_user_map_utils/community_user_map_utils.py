@@ -228,6 +228,7 @@ def deckgl_layers(
     highlight_on_click: bool = True,
     on_click: dict = None,
     debug: bool = False,
+    hex_dictionary: bool = False,
 ):
     """
     Render mixed hex and vector layers on a single interactive map.
@@ -254,6 +255,8 @@ def deckgl_layers(
             - "message_type": Message type string (default: "feature_click")
             - "include_coords": Include click lat/lng (default: True)
             - "include_layer": Include layer name (default: True)
+        hex_dictionary: If True, dictionary-encode the hex id strings in the layer payload
+            (smaller HTML when the same cell appears in many rows).
     
     Examples:
         # Mix hex and vector layers
@@ -390,73 +393,31 @@ def deckgl_layers(
             if is_tile_layer:
                 has_tile_layers = True
             
-            # Convert dataframe to records (for static layers)
-            data_records = []
-            df_clean = None
+            # Serialize the dataframe once (static layers); the client decodes records from it
+            # and loads the same bytes into DuckDB for SQL filtering
+            layer_payload = None
             if not is_tile_layer and df is not None and hasattr(df, 'to_dict'):
-                import numpy as np
-                import json
-                
-                # Drop geometry column - hex layers use hex ID, not geometry
-                df_clean = df.drop(columns=['geometry'], errors='ignore') if hasattr(df, 'drop') else df
-                df_clean = df_clean.copy()
-                
-                # Vectorized hex ID conversion FIRST (converts BigInt hex to string)
-                hex_col = next((c for c in ['hex', 'h3', 'index', 'id'] if c in df_clean.columns), None)
-                if hex_col:
-                    def _to_hex_str(val):
-                        if val is None: return None
-                        try:
-                            if isinstance(val, (int, float, np.integer)): return format(int(val), 'x')
-                            if isinstance(val, str): return format(int(val), 'x') if val.isdigit() else val
-                        except (ValueError, OverflowError): pass
-                        return str(val) if val is not None else None
-                    df_clean['hex'] = df_clean[hex_col].apply(_to_hex_str)
-                
-                # Convert all int64/uint64 to regular Python types for JSON serialization
-                def _convert_value(val):
-                    if val is None or (isinstance(val, float) and np.isnan(val)):
-                        return None
-                    if isinstance(val, (np.integer, np.int64, np.uint64)):
-                        return int(val)
-                    if isinstance(val, np.floating):
-                        return float(val)
-                    return val
-                
-                # Convert to records and sanitize each value
-                raw_records = df_clean.to_dict('records')
-                data_records = [
-                    {k: _convert_value(v) for k, v in row.items()}
-                    for row in raw_records
-                ]
+                hex_frame = _hex_layer_frame(df)
+                if len(hex_frame) > 0:
+                    layer_payload = _layer_payload(
+                        hex_frame, dictionary_columns=["hex"] if hex_dictionary else ()
+                    )
             
             tooltip_columns = _extract_tooltip_columns((config, merged_config, hex_layer))
             
-            # Enable DuckDB SQL only when we can serialize Parquet (known-good input path).
-            layer_sql = hex_layer.get("sql", "SELECT * FROM data")  # Default SQL (only used if parquetData exists)
-            parquet_base64 = None
-            if not is_tile_layer and df_clean is not None and len(data_records) > 0:
-                # Serialize to Parquet for efficient DuckDB loading
-                import io
-                import base64
-                try:
-                    buf = io.BytesIO()
-                    df_clean.to_parquet(buf, index=False)
-                    parquet_base64 = base64.b64encode(buf.getvalue()).decode('ascii')
-                except Exception:
-                    parquet_base64 = None
-                
-                if parquet_base64:
-                    has_sql_layers = True
-                else:
-                    # No fallback: skip SQL for this layer if Parquet serialization fails.
-                    layer_sql = None
+            # DuckDB SQL is enabled for every static layer with rows (it reads the same payload).
+            layer_sql = hex_layer.get("sql", "SELECT * FROM data")
+            if layer_payload:
+                has_sql_layers = True
+            else:
+                layer_sql = None
             
             processed_layers.append({
                 "id": f"layer-{i}",
                 "name": name,
                 "layerType": "hex",
-                "data": data_records,
+                "data": [],
+                "arrowData": layer_payload,
                 "tileUrl": tile_url,
                 "isTileLayer": is_tile_layer,
                 "tileLayerConfig": tile_layer_config,
@@ -465,8 +426,7 @@ def deckgl_layers(
                 "fillDomainFromUser": fill_domain_from_user,
                 "tooltipColumns": tooltip_columns,
                 "visible": visible,
-                "sql": layer_sql if (not is_tile_layer and len(data_records) > 0 and parquet_base64) else None,
-                "parquetData": parquet_base64,
+                "sql": layer_sql,
             })
             
         elif layer_type == "vector":
@@ -569,6 +529,7 @@ def deckgl_layers(
             
             # Standard GeoJSON vector layer
             geojson_obj = {"type": "FeatureCollection", "features": []}
+            vector_payload = None
             if df is not None:
                 # Reproject to EPSG:4326 if needed
                 if hasattr(df, "crs") and df.crs and getattr(df.crs, "to_epsg", lambda: None)() != 4326:
@@ -577,16 +538,12 @@ def deckgl_layers(
                     except Exception:
                         pass
                 
-                # Robust GeoJSON conversion (fixed):
-                # 1) prefer GeoPandas to_json()
-                # 2) fallback to __geo_interface__ if to_json fails
-                if hasattr(df, "to_json"):
-                    try:
-                        geojson_obj = json.loads(df.to_json())
-                    except Exception:
-                        geojson_obj = {"type": "FeatureCollection", "features": []}
-
-                if (not geojson_obj.get("features")) and hasattr(df, "__geo_interface__"):
+                if isinstance(df, gpd.GeoDataFrame):
+                    # Properties + GeoJSON geometry strings go out as one binary payload; the client
+                    # builds the FeatureCollection (and the `_fused_idx` click index) from it.
+                    if len(df) > 0:
+                        vector_payload = _layer_payload(_vector_layer_frame(df))
+                elif hasattr(df, "__geo_interface__"):
                     try:
                         gi = df.__geo_interface__
                         if isinstance(gi, dict) and gi.get("type") == "FeatureCollection":
@@ -594,10 +551,10 @@ def deckgl_layers(
                     except Exception:
                         pass
                 
-                # Add unique index to each feature for unclipped geometry lookup on click
-                for idx, feat in enumerate(geojson_obj.get("features", []) or []):
-                    feat["properties"] = {k: _sanitize_geojson_value(v) for k, v in (feat.get("properties") or {}).items()}
-                    feat["properties"]["_fused_idx"] = idx
+                    # Add unique index to each feature for unclipped geometry lookup on click
+                    for idx, feat in enumerate(geojson_obj.get("features", []) or []):
+                        feat["properties"] = {k: _sanitize_geojson_value(v) for k, v in (feat.get("properties") or {}).items()}
+                        feat["properties"]["_fused_idx"] = idx
             
             # Extract color config - only if layer is filled
             fill_color_config = {}
@@ -639,6 +596,7 @@ def deckgl_layers(
                 "name": name,
                 "layerType": "vector",
                 "geojson": geojson_obj,
+                "arrowData": vector_payload,
                 "config": merged_config,
                 "vectorLayer": vector_layer,
                 "fillDomainFromUser": fill_domain_from_user,
@@ -721,6 +679,10 @@ def deckgl_layers(
   <script src="https://unpkg.com/@deck.gl/geo-layers@9.1.3/dist.min.js"></script>
   <script src="https://unpkg.com/@deck.gl/carto@9.1.3/dist.min.js"></script>
   {% endif %}
+  {% if has_arrow_layers %}
+  <!-- Arrow IPC decoding for static layer payloads (classic script so data is ready before the map script runs) -->
+  <script src="https://cdn.jsdelivr.net/npm/apache-arrow@17.0.0/Arrow.es2015.min.js"></script>
+  {% endif %}
   {% if has_sql_layers %}
   <script src="https://cdn.jsdelivr.net/npm/@duckdb/duckdb-wasm@1.29.1-dev132.0/dist/duckdb-wasm.js"></script>
   <script type="module">
@@ -1417,6 +1379,53 @@ def deckgl_layers(
       streets: "mapbox://styles/mapbox/streets-v12"
     };
     
+    // ========== Layer Payloads ==========
+    // Static layers ship once as a base64 Arrow IPC stream: hex rows become l.data, vector rows
+    // become l.geojson, and the raw bytes are kept for DuckDB (see initDuckDB).
+    function base64ToBytes(b64) {
+      const bin = atob(b64);
+      const bytes = new Uint8Array(bin.length);
+      for (let i = 0; i < bin.length; i++) bytes[i] = bin.charCodeAt(i);
+      return bytes;
+    }
+
+    function arrowToRecords(table) {
+      const names = table.schema.fields.map(f => f.name);
+      const cols = names.map(name => Array.from(table.getChild(name) || [], v =>
+        typeof v === 'bigint' ? Number(v) : (v && typeof v === 'object' && typeof v.toJSON === 'function') ? v.toJSON() : v
+      ));
+      const rows = new Array(table.numRows);
+      for (let i = 0; i < table.numRows; i++) {
+        const row = {};
+        for (let j = 0; j < names.length; j++) row[names[j]] = cols[j][i];
+        rows[i] = row;
+      }
+      return rows;
+    }
+
+    LAYERS_DATA.forEach(l => {
+      if (!l.arrowData) return;
+      try {
+        const bytes = base64ToBytes(l.arrowData);
+        const rows = arrowToRecords(window.Arrow.tableFromIPC(bytes));
+        if (l.layerType === 'vector') {
+          const features = rows.map((props, idx) => {
+            const geom = props.__geometry__;
+            delete props.__geometry__;
+            props._fused_idx = idx;
+            return { type: 'Feature', properties: props, geometry: geom ? JSON.parse(geom) : null };
+          });
+          l.geojson = { type: 'FeatureCollection', features };
+        } else {
+          l.data = rows;
+          l.arrowBytes = bytes;
+        }
+      } catch (e) {
+        console.error('[layers] failed to decode payload for', l.id, e);
+      }
+      delete l.arrowData;
+    });
+
     // Track layer visibility
     const layerVisibility = {};
     LAYERS_DATA.forEach(l => { layerVisibility[l.id] = l.visible; });
@@ -1609,16 +1618,10 @@ def deckgl_layers(
           if (l.sql && l.data && l.data.length > 0) {
             const tableName = l.id.replace(/-/g, '_'); // layer-0 -> layer_0
             
-            // Prefer Parquet (faster, smaller). If missing, skip DuckDB load for this layer.
-            if (l.parquetData) {
-              // Decode base64 Parquet and register
-              const binaryString = atob(l.parquetData);
-              const bytes = new Uint8Array(binaryString.length);
-              for (let i = 0; i < binaryString.length; i++) {
-                bytes[i] = binaryString.charCodeAt(i);
-              }
-              await db.registerFileBuffer(`${tableName}.parquet`, bytes);
-              await duckConn.query(`CREATE OR REPLACE TABLE ${tableName} AS SELECT * FROM read_parquet('${tableName}.parquet')`);
+            // Same Arrow bytes the records were decoded from. If missing, skip DuckDB load for this layer.
+            if (l.arrowBytes) {
+              await duckConn.query(`DROP TABLE IF EXISTS ${tableName}`);
+              await duckConn.insertArrowFromIPCStream(l.arrowBytes, { name: tableName, create: true });
             } else { continue; }
             
             // Also create an alias 'data' for the first SQL layer
@@ -5339,6 +5342,7 @@ def deckgl_layers(
         has_tile_layers=has_tile_layers,
         has_mvt_layers=has_mvt_layers,
         has_sql_layers=has_sql_layers,
+        has_arrow_layers=any(l.get("arrowData") for l in processed_layers),
         highlight_on_click=highlight_on_click,
         palettes=(["ArmyRose"] + sorted([p for p in KNOWN_CARTOCOLOR_PALETTES if p != "ArmyRose"])),
         on_click=on_click or {},
@@ -6479,6 +6483,161 @@ def _sanitize_geojson_value(v):
     return str(v) if v is not None else None
 
 
+_HEX_DIGITS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+
+
+def _format_hex_ints(values):
+    """Vectorized uint64 -> lowercase hex string without leading zeros (same as format(v, 'x'))."""
+    values = np.ascontiguousarray(values, dtype=np.uint64)
+    shifts = np.arange(60, -4, -4, dtype=np.uint64)
+    nibbles = ((values[:, None] >> shifts) & np.uint64(0xF)).astype(np.uint8)
+    digits = np.ascontiguousarray(_HEX_DIGITS[nibbles]).view("S16").ravel()
+    digits = np.char.lstrip(digits, b"0")
+    digits[digits == b""] = b"0"
+    return digits.astype(str)
+
+
+def _hex_id_strings(series):
+    """
+    H3 ids as lowercase hex strings, vectorized.
+
+    Integers and all-digit strings are formatted as hex, other strings (already hex) are kept,
+    missing values stay missing. Mirrors the per-row conversion the map client expects.
+    """
+    if pd.api.types.is_integer_dtype(series.dtype) and not pd.api.types.is_extension_array_dtype(series.dtype):
+        if not (pd.api.types.is_signed_integer_dtype(series.dtype) and (series.values < 0).any()):
+            return pd.Series(_format_hex_ints(series.values), index=series.index, dtype=object)
+
+    out = series.astype(object).copy()
+    valid = series.notna().values
+    if not valid.any():
+        return out
+    if pd.api.types.is_numeric_dtype(series.dtype):
+        numeric = pd.to_numeric(series[valid], errors="coerce")
+        ok = numeric.notna() & np.isfinite(numeric) & (numeric >= 0)
+        out.loc[ok[ok].index] = _format_hex_ints(numeric[ok].astype(np.uint64).values)
+        return out
+    text = series[valid].astype(str)
+    digits = text.str.isdigit()
+    if digits.any():
+        out.loc[digits[digits].index] = _format_hex_ints(text[digits].astype(np.uint64).values)
+    return out
+
+
+def _payload_column(series):
+    """Coerce a property column to something Arrow stores and the map client can read as JSON-like."""
+    if isinstance(series.dtype, pd.DatetimeTZDtype) or pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return series.astype(str).where(series.notna(), None)
+    if pd.api.types.is_timedelta64_dtype(series.dtype) or isinstance(series.dtype, pd.PeriodDtype):
+        return series.astype(str).where(series.notna(), None)
+    if series.dtype == object and pd.api.types.infer_dtype(series, skipna=True) not in ("string", "empty"):
+        return series.map(_sanitize_geojson_value)
+    return series
+
+
+def _layer_payload(df, dictionary_columns=()):
+    """
+    Serialize a layer's rows once, as a base64 Arrow IPC stream.
+
+    This single payload is what the map client decodes into records / GeoJSON and what it hands
+    to DuckDB-WASM for SQL filtering, so layers are no longer embedded as JSON plus Parquet.
+    The stream is uncompressed because Arrow JS cannot read compressed IPC buffers.
+    """
+    import base64
+    import pyarrow as pa
+
+    columns = {}
+    for col in df.columns:
+        columns[str(col)] = _payload_column(df[col])
+    frame = pd.DataFrame(columns, index=df.index)
+    try:
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError):
+        # mixed-type object columns: fall back to strings for those
+        for col in frame.columns:
+            if frame[col].dtype == object:
+                frame[col] = frame[col].map(lambda v: None if v is None else str(v))
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+    # plain utf8 (not large_string) for Arrow JS / DuckDB-WASM, and no pandas metadata in the page
+    table = table.cast(pa.schema([
+        pa.field(f.name, pa.string()) if pa.types.is_large_string(f.type) else f for f in table.schema
+    ]))
+    table = table.replace_schema_metadata(None)
+    for col in dictionary_columns:
+        idx = table.schema.get_field_index(col)
+        if idx >= 0 and pa.types.is_string(table.schema.field(idx).type):
+            table = table.set_column(idx, col, table.column(idx).dictionary_encode())
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return base64.b64encode(sink.getvalue()).decode("ascii")
+
+
+def _hex_layer_frame(df):
+    """Hex layer rows for the payload: geometry dropped, a hex-string `hex` column added from the id column."""
+    frame = df.drop(columns=["geometry"], errors="ignore")
+    frame = pd.DataFrame(frame).copy()
+    hex_col = next((c for c in ["hex", "h3", "index", "id"] if c in frame.columns), None)
+    if hex_col:
+        frame["hex"] = _hex_id_strings(frame[hex_col])
+    return frame
+
+
+def _vector_layer_frame(gdf):
+    """Vector layer rows for the payload: properties plus a `__geometry__` GeoJSON string column."""
+    import shapely
+
+    frame = pd.DataFrame(gdf.drop(columns=[gdf.geometry.name]))
+    geoms = np.asarray(gdf.geometry.values, dtype=object)
+    frame["__geometry__"] = shapely.to_geojson(geoms)
+    return frame
+
+
+def benchmark_layer_payload(n: int = 500_000, repeats: int = 3):
+    """
+    Size and build time of one hex layer, as previously embedded (JSON records + base64 Parquet)
+    versus the single Arrow payload (with and without dictionary-encoded hex strings).
+    """
+    import base64
+    import io
+    import time
+
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        "hex": (np.uint64(0x8928308280fffff) + rng.integers(0, 1 << 24, n).astype(np.uint64) * np.uint64(1 << 3)),
+        "value": rng.random(n) * 100,
+        "count": rng.integers(0, 1000, n),
+    })
+
+    def _legacy():
+        clean = df.copy()
+        clean["hex"] = clean["hex"].apply(lambda v: format(int(v), "x"))
+        records = [
+            {k: (int(v) if isinstance(v, np.integer) else float(v) if isinstance(v, np.floating) else v) for k, v in row.items()}
+            for row in clean.to_dict("records")
+        ]
+        buf = io.BytesIO()
+        clean.to_parquet(buf, index=False)
+        return json.dumps(records) + base64.b64encode(buf.getvalue()).decode("ascii")
+
+    def _timed(fn):
+        best, out = float("inf"), None
+        for _ in range(repeats):
+            t0 = time.perf_counter()
+            out = fn()
+            best = min(best, time.perf_counter() - t0)
+        return {"seconds": round(best, 3), "mb": round(len(out) / 1e6, 1)}
+
+    results = {
+        "legacy_json_plus_parquet": _timed(_legacy),
+        "arrow": _timed(lambda: _layer_payload(_hex_layer_frame(df))),
+        "arrow_dictionary_hex": _timed(lambda: _layer_payload(_hex_layer_frame(df), dictionary_columns=["hex"])),
+    }
+    print(pd.DataFrame(results).T)
+    return results
+
+
 # ============================================================================
 # PYDECK UTILITY FUNCTIONS
 # ============================================================================
@@ -7,7 +7,8 @@ def udf(
     table_tif_bounds: str = "s3://fused-asset/data/zonal_stats_example/assets_with_bounds_4_4.parquet",
     table_muni_geoboundaries: str = 's3://fused-asset/data/geoboundaries/adm2_064_v2/',
     _use_cached_output: bool = False,
-    save: bool=False
+    save: bool=False,
+    zonal_mode: str = "windowed",
 ):
     import os
     import geopandas as gpd
@@ -82,8 +83,40 @@ def udf(
     filename = gdf_cell[["url"]].iloc[0].values[0]
     tiff_url = f"s3://fused-asset/gfc2020/{filename}"
 
-    # 5. Get TIFF dataset - clip to muni bounds to reduce memory
+    if zonal_mode == "windowed":
+        # 5-6. Range-read only the COG blocks under the municipalities and reduce them
+        # with a label raster (no download of the full TIFF)
+        print(f"Processing {len(gdf_muni)} municipalities (windowed reads)...")
+        df_pre_final = zonal_stats_windowed(gdf_muni=gdf_muni, tiff_url=tiff_url)
+    else:
+        df_pre_final = zonal_stats_download(gdf_muni=gdf_muni, tiff_url=tiff_url)
+
+    # 7. Structure final table
+    df_final = pd.concat([gdf_muni.reset_index(drop=True), df_pre_final], axis=1)
+    df_final.drop("tiff_url", axis=1, inplace=True)
+
+    # *Shift back if antimeridian handling was used
+    if translate:
+        df_final.geometry = df_final.geometry.translate(xoff=-360)
+
+    # 8. Recompute stats_mean
+    df_final["stats_mean"] = df_final["stats_sum"] / df_final["stats_count"]
+
+    # 9. Save
+    if save==True:
+        path_output = os.path.join(output_dir, f"out_{cell_id}.parquet")
+        print("Saving to", path_output)
+        df_final.to_parquet(path_output)
+
+
+    return df_final
+
+
+def zonal_stats_download(gdf_muni, tiff_url):
+    """Zonal stats from a full local copy of the TIFF, clipped to the muni bounds (legacy mode)."""
     import gc
+
+    common = fused.load("https://github.com/fusedio/udfs/tree/3991434/public/common/")
     geom_bounds_muni = common.geo_bbox(gdf_muni).geometry[0]
 
     @fused.cache
@@ -119,26 +152,7 @@ def udf(
     # Free raster memory
     del da
     gc.collect()
-
-    # 7. Structure final table
-    df_final = pd.concat([gdf_muni.reset_index(drop=True), df_pre_final], axis=1)
-    df_final.drop("tiff_url", axis=1, inplace=True)
-
-    # *Shift back if antimeridian handling was used
-    if translate:
-        df_final.geometry = df_final.geometry.translate(xoff=-360)
-
-    # 8. Recompute stats_mean
-    df_final["stats_mean"] = df_final["stats_sum"] / df_final["stats_count"]
-
-    # 9. Save
-    if save==True:
-        path_output = os.path.join(output_dir, f"out_{cell_id}.parquet")
-        print("Saving to", path_output)
-        df_final.to_parquet(path_output)
-
-
-    return df_final
+    return df_pre_final
 
 
 @fused.cache
@@ -314,7 +328,185 @@ def zonal_stats_df(gdf_muni, da, tiff_url, stats_dict):
     return df_pre_final
 
 
+# GDAL settings for range reads of COGs on S3: no directory listing on open, and adjacent
+# tile requests merged into one range request
+COG_ENV = dict(
+    GDAL_DISABLE_READDIR_ON_OPEN="EMPTY_DIR",
+    GDAL_HTTP_MERGE_CONSECUTIVE_RANGES="YES",
+    GDAL_HTTP_MULTIPLEX="YES",
+    VSI_CACHE="TRUE",
+)
 
 
+def cog_block_windows(src, geoms, chunk_blocks=4):
+    """
+    Windows of `chunk_blocks` x `chunk_blocks` internal blocks of `src` that intersect any of `geoms`.
 
-    
+    Only these windows are read, so blocks between / around the municipalities are never fetched.
+    """
+    import numpy as np
+    import shapely
+    from rasterio.windows import Window, bounds as window_bounds
+
+    block_h, block_w = src.block_shapes[0]
+    step_h, step_w = block_h * chunk_blocks, block_w * chunk_blocks
+    window = src.window(*shapely.total_bounds(geoms))
+    row0 = max(int(np.floor(window.row_off)) // block_h * block_h, 0)
+    col0 = max(int(np.floor(window.col_off)) // block_w * block_w, 0)
+    row1 = min(int(np.ceil(window.row_off + window.height)), src.height)
+    col1 = min(int(np.ceil(window.col_off + window.width)), src.width)
+    windows = [
+        Window(c, r, min(step_w, col1 - c), min(step_h, row1 - r))
+        for r in range(row0, row1, step_h)
+        for c in range(col0, col1, step_w)
+    ]
+    if not windows:
+        return []
+    boxes = shapely.box(*np.array([window_bounds(w, src.transform) for w in windows]).T)
+    hits = np.unique(shapely.STRtree(geoms).query(boxes, predicate="intersects")[0])
+    return [windows[i] for i in hits]
+
+
+def window_sizes(geoms, transform, shape):
+    """Pixel count of each geometry's bbox window (+1 pixel margin), as `size` in zonal_stats_df."""
+    import numpy as np
+    import shapely
+
+    minx, miny, maxx, maxy = shapely.bounds(geoms).T
+    inv = ~transform
+    col_a, row_a = inv * (minx, maxy)
+    col_b, row_b = inv * (maxx, miny)
+    rows = np.sort(np.stack([row_a, row_b]), axis=0)
+    cols = np.sort(np.stack([col_a, col_b]), axis=0)
+    height = np.clip(np.ceil(rows[1]) + 1, 0, shape[0]) - np.clip(np.floor(rows[0]) - 1, 0, shape[0])
+    width = np.clip(np.ceil(cols[1]) + 1, 0, shape[1]) - np.clip(np.floor(cols[0]) - 1, 0, shape[1])
+    return (np.maximum(height, 0) * np.maximum(width, 0)).astype("int64")
+
+
+def zonal_layers(geoms):
+    """Indices of `geoms` split into layers of non-overlapping geometries (touching is fine)."""
+    import numpy as np
+    import shapely
+
+    left, right = shapely.STRtree(geoms).query(geoms, predicate="intersects")
+    pairs = left < right
+    left, right = left[pairs], right[pairs]
+    overlap = ~shapely.touches(geoms[left], geoms[right])
+    earlier = {}
+    for a, b in zip(left[overlap], right[overlap]):
+        earlier.setdefault(b, []).append(a)
+    layer = np.zeros(len(geoms), dtype="int64")
+    for i in range(len(geoms)):
+        used = {layer[j] for j in earlier.get(i, [])}
+        while layer[i] in used:
+            layer[i] += 1
+    return [np.flatnonzero(layer == k) for k in range(layer.max() + 1)] if len(geoms) else []
+
+
+def zonal_sums(blocks, geoms):
+    """
+    Pixel count, valid count and valid sum per geometry over an iterable of (data, transform) blocks.
+
+    Each layer of non-overlapping geometries is burned into one int32 label raster per block
+    (pixel centers, as geometry_mask in zonal_stats_df) and reduced with np.bincount.
+    """
+    import numpy as np
+    import shapely
+    from rasterio.features import rasterize
+    from rasterio.windows import bounds as window_bounds, Window
+
+    n = len(geoms)
+    n_pixels = np.zeros(n + 1, dtype="int64")
+    count = np.zeros(n + 1, dtype="int64")
+    total = np.zeros(n + 1, dtype="float64")
+    tree = shapely.STRtree(geoms)
+    layers = zonal_layers(geoms)
+    for data, transform in blocks:
+        values = np.ma.getdata(data).ravel()
+        valid = ~np.ma.getmaskarray(data).ravel()
+        if values.dtype.kind == "f":
+            valid &= np.isfinite(values)
+        block_box = shapely.box(*window_bounds(Window(0, 0, data.shape[-1], data.shape[-2]), transform))
+        hits = tree.query(block_box, predicate="intersects")
+        for layer in layers:
+            layer = np.intersect1d(layer, hits)
+            if not len(layer):
+                continue
+            labels = rasterize(
+                zip(geoms[layer], layer + 1), out_shape=data.shape, transform=transform, fill=0, dtype="int32"
+            ).ravel()
+            n_pixels += np.bincount(labels, minlength=n + 1)
+            count += np.bincount(labels[valid], minlength=n + 1)
+            total += np.bincount(labels[valid], weights=values[valid], minlength=n + 1)
+    return n_pixels[1:], count[1:], total[1:]
+
+
+def zonal_stats_windowed(gdf_muni, tiff_url, chunk_blocks=4, max_workers=16, retries=2):
+    """
+    Zonal stats reading only the COG blocks that intersect the municipalities.
+
+    Block windows are range-read concurrently (one dataset handle per read, GDAL env per
+    thread) and reduced by `zonal_sums` as they arrive, so only about `max_workers` windows
+    are held in memory. Returns the same columns as zonal_stats_df; `stats_count` counts
+    the pixels whose center is inside the polygon and `stats_sum` is the sum of their valid
+    values (nodata pixels are skipped instead of turning the sum into NaN).
+    """
+    import time
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    import numpy as np
+    import pandas as pd
+    import rasterio
+
+    columns = ["tiff_url", "i", "stats_mean", "stats_sum", "stats_count", "stats_size"]
+    n = len(gdf_muni)
+    geoms = gdf_muni.geometry.values
+
+    try:
+        with rasterio.Env(**COG_ENV):
+            with rasterio.open(tiff_url) as src:
+                windows = cog_block_windows(src, geoms, chunk_blocks=chunk_blocks)
+                transform, shape = src.transform, src.shape
+    except Exception as e:
+        print(f"Error opening TIFF: {e}")
+        return pd.DataFrame([[tiff_url, i] + [-1] * 4 for i in range(n)], columns=columns)
+    print(f"Reading {len(windows)} windows of {chunk_blocks}x{chunk_blocks} blocks")
+
+    def read_window(window):
+        for attempt in range(retries + 1):
+            try:
+                with rasterio.Env(**COG_ENV):
+                    with rasterio.open(tiff_url) as src:
+                        return src.read(1, window=window, masked=True), src.window_transform(window)
+            except rasterio.RasterioIOError:
+                if attempt == retries:
+                    raise
+                time.sleep(0.5 * 2**attempt)
+
+    def blocks():
+        # keep at most max_workers reads in flight
+        todo = iter(windows)
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            pending = {pool.submit(read_window, w) for w in [next(todo) for _ in range(min(max_workers, len(windows)))]}
+            while pending:
+                future = next(as_completed(pending))
+                pending.remove(future)
+                window = next(todo, None)
+                if window is not None:
+                    pending.add(pool.submit(read_window, window))
+                yield future.result()
+
+    n_pixels, count, total = zonal_sums(blocks(), np.asarray(geoms))
+
+    with np.errstate(all="ignore"):
+        mean = total / count
+    df = pd.DataFrame({
+        "tiff_url": tiff_url,
+        "i": np.arange(n),
+        "stats_mean": mean,
+        "stats_sum": total,
+        "stats_count": n_pixels,
+        "stats_size": window_sizes(geoms, transform, shape),
+    }, columns=columns)
+    # as in zonal_stats_df, polygons outside the raster get 0 for every stat
+    df.loc[df["stats_size"].values == 0, columns[2:]] = 0
+    return df
@@ -26,12 +26,7 @@ def udf(
 
     # Print out the top 20 classes
     print(crop_counts(array_int).head(20))
-    colormap = metadata["colormap"]
-    colored_array = (
-        np.array([colormap[value] for value in array_int.flat], dtype=np.uint8)
-        .reshape(array_int.shape + (4,))
-        .transpose(2, 0, 1)
-    )
+    colored_array = colormap_lut(metadata["colormap"])[:, np.asarray(array_int)]
 
     if colored:
         if image_format.lower() in ("jpeg", "jpg"):  # best lossy compression
@@ -48,6 +43,15 @@ def udf(
         return array_int, bounds
 
 
+def colormap_lut(colormap):
+    """(4, n) uint8 lookup table of a GDAL colormap dict; `lut[:, arr]` colors a whole tile in one gather."""
+    import numpy as np
+
+    lut = np.zeros((4, max(colormap) + 1), dtype=np.uint8)
+    lut[:, list(colormap)] = np.array(list(colormap.values()), dtype=np.uint8).T
+    return lut
+
+
 @fused.cache
 def crop_to_int(crop_type, verbose=True):
     import pandas as pd
@@ -0,0 +1,41 @@
+import os
+import fused
+import geopandas as gpd
+import pandas as pd
+import pytest
+
+COMMON_PATH = os.path.join(os.path.abspath(os.curdir), "public", "common")
+
+
+@pytest.fixture(scope="module")
+def common():
+    return fused.load(COMMON_PATH)
+
+
+def test_df_fingerprint_stable_across_serialize_round_trip(
+    common, sample_geodataframe: gpd.GeoDataFrame
+):
+    """
+    A GeoDataFrame restored by deserialize_obj has an equal CRS (stored as PROJJSON),
+    so it must fingerprint the same as the original, or df_to_s3/to_paths dedupe misses.
+    """
+    back = common.deserialize_obj(common.serialize_obj(sample_geodataframe))
+    assert back.crs == sample_geodataframe.crs
+    assert common.df_fingerprint(back) == common.df_fingerprint(sample_geodataframe)
+
+
+def test_df_fingerprint_distinguishes_timezones(common):
+    """
+    Timestamps that only differ by timezone are different data and must not collide,
+    as columns or as index levels.
+    """
+    naive = pd.date_range("2024-01-01", periods=3, freq="h")
+    frames = [
+        pd.DataFrame({"t": naive}),
+        pd.DataFrame({"t": naive.tz_localize("UTC")}),
+        pd.DataFrame({"t": naive.tz_localize("UTC").tz_convert("US/Pacific")}),
+    ]
+    assert len({common.df_fingerprint(df) for df in frames}) == len(frames)
+
+    indexed = [df.set_index("t").assign(v=1) for df in frames]
+    assert len({common.df_fingerprint(df) for df in indexed}) == len(indexed)